@@ -7,22 +7,23 @@ The recipient's username/chat_id is configured privately via environment variabl
 """
 
 import asyncio
-import json
 import logging
 import os
+import secrets
 import signal
 import sys
-import uuid
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 from typing import Any, Dict, List, Optional
 
+import orjson
 import uvicorn
-from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from pydantic_settings import BaseSettings
 from telegram import Bot
+from telegram.request import HTTPXRequest
 
 
 # --- Configuration ---
@@ -32,6 +33,13 @@ class Settings(BaseSettings):
     host: str = "127.0.0.1"
     port: int = 8008
     debug: bool = False
+    telegram_pool_size: int = 32
+    max_sessions: int = 1024
+    # Sessions live in process memory, so running more than one worker
+    # requires a reverse proxy that sticky-routes by the sessionId query
+    # param (hash it) so each session always lands on the same worker.
+    # Set to 0 to use one worker per CPU core.
+    workers: int = 1
     
     class Config:
         env_file = ".env"
@@ -59,41 +67,72 @@ class JSONRPCNotification(BaseModel):
     params: Optional[Dict[str, Any]] = None
 
 
+class SendMessageParams(BaseModel):
+    message: str = Field(min_length=1)
+
+
+# Built once so every notification reuses the same pydantic-core
+# serializer and dumps straight to bytes
+_NOTIF_ADAPTER = TypeAdapter(JSONRPCNotification)
+
+
 # --- Session Management ---
+# Pushed into the event queue on close so the reader wakes immediately
+# instead of polling session.closed on a timer
+_CLOSE_SENTINEL = object()
+
+# Constant SSE fragments, interned once per process so the per-event and
+# per-keep-alive loops allocate nothing for the fixed parts
+_KEEPALIVE = b": keep-alive\n\n"
+_MESSAGE_EVENT_PREFIX = b"event: message\ndata: "
+
+
 class SSESession:
     def __init__(self, session_id: str):
         self.session_id = session_id
         self.event_queue = asyncio.Queue(maxsize=100)
-        self.notification_queue = asyncio.Queue(maxsize=100)
         self.initialized = False
         self.closed = False
         
-    async def send_event(self, event: str) -> bool:
+    async def send_event(self, event: bytes) -> bool:
         if self.closed:
             return False
         try:
-            self.event_queue.put_nowait(event)
+            # Bounded put with a deadline: producers wait instead of
+            # silently dropping frames when the queue is full
+            await asyncio.wait_for(self.event_queue.put(event), timeout=5.0)
             return True
-        except asyncio.QueueFull:
-            logging.warning(f"Event queue full for session {self.session_id}")
+        except asyncio.TimeoutError:
+            # The consumer has not drained for 5s; treat the peer as dead
+            logging.warning("Event queue stalled for session %s, closing", self.session_id)
+            self.close()
             return False
     
     async def send_notification(self, notification: JSONRPCNotification) -> bool:
-        if self.closed:
-            return False
-        try:
-            self.notification_queue.put_nowait(notification)
-            return True
-        except asyncio.QueueFull:
-            logging.warning(f"Notification queue full for session {self.session_id}")
-            return False
-    
+        # Format to an SSE frame up front; notifications share the single
+        # event queue instead of a dedicated queue + relay task
+        event_data = _NOTIF_ADAPTER.dump_json(notification)
+        return await self.send_event(_MESSAGE_EVENT_PREFIX + event_data + b"\n\n")
+
     def close(self):
+        if self.closed:
+            return
         self.closed = True
+        # Discard queued frames so large payloads are reclaimed now rather
+        # than when the queue object itself is garbage collected; freeing
+        # the slots also wakes any producer blocked in put()
+        while not self.event_queue.empty():
+            self.event_queue.get_nowait()
+        self.event_queue.put_nowait(_CLOSE_SENTINEL)
 
 
 # --- Global State ---
-sessions: Dict[str, SSESession] = {}
+# Session IDs are opaque random tokens, not protocol-mandated UUIDs;
+# token_hex is cheaper than uuid4 and bound once to skip the attribute walk
+_token_hex = secrets.token_hex
+
+# Ordered oldest-first so the LRU session can be evicted in O(1)
+sessions: "OrderedDict[str, SSESession]" = OrderedDict()
 settings = Settings()
 telegram_bot: Optional[Bot] = None
 
@@ -102,35 +141,36 @@ telegram_bot: Optional[Bot] = None
 async def initialize_telegram():
     global telegram_bot
     try:
-        telegram_bot = Bot(token=settings.telegram_bot_token)
+        # One pooled httpx client for the life of the process, so repeated
+        # send_message calls reuse the TLS connection to api.telegram.org
+        request = HTTPXRequest(
+            connection_pool_size=settings.telegram_pool_size,
+            pool_timeout=5.0,
+            connect_timeout=5.0,
+        )
+        telegram_bot = Bot(token=settings.telegram_bot_token, request=request)
+        await telegram_bot.initialize()
         bot_info = await telegram_bot.get_me()
-        logging.info(f"Connected to Telegram bot: @{bot_info.username}")
+        logging.info("Connected to Telegram bot: @%s", bot_info.username)
         return True
     except Exception as e:
-        logging.error(f"Failed to connect to Telegram: {e}")
+        logging.error("Failed to connect to Telegram: %s", e)
         return False
 
 
 # --- MCP Tool Handlers ---
-async def handle_send_message(params: Dict[str, Any]) -> Dict[str, Any]:
+async def handle_send_message(params: SendMessageParams) -> Dict[str, Any]:
     """Send a text message via Telegram using HTML formatting"""
     if not telegram_bot:
         raise HTTPException(status_code=500, detail="Telegram bot not initialized")
     
-    logging.info(f"handle_send_message (now notify_with_telegram:text) called with params: {params}")
-    message = params.get("message")
-    if not message:
-        raise HTTPException(status_code=400, detail="Missing 'message' parameter")
-
-    final_telegram_parse_mode = "HTML" # Always use HTML
-    
-    logging.info(f"Effective Telegram parse_mode: '{final_telegram_parse_mode}' for message: '{message[:50]}...'")
+    logging.info("handle_send_message (now notify_with_telegram:text) called with message: '%.50s...'", params.message)
 
     try:
         sent_message = await telegram_bot.send_message(
             chat_id=settings.telegram_chat_id,
-            text=message,
-            parse_mode=final_telegram_parse_mode
+            text=params.message,
+            parse_mode="HTML"  # Always use HTML
         )
         
         return {
@@ -140,7 +180,7 @@ async def handle_send_message(params: Dict[str, Any]) -> Dict[str, Any]:
             "text": sent_message.text
         }
     except Exception as e:
-        logging.error(f"Failed to send message: {e}")
+        logging.error("Failed to send message: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
 
 
@@ -151,6 +191,7 @@ async def handle_send_message(params: Dict[str, Any]) -> Dict[str, Any]:
 TOOLS = {
     "notify_with_telegram:text": {
         "handler": handle_send_message,
+        "params_model": SendMessageParams,
         "schema": {
             "name": "notify_with_telegram:text",
             "description": "Send a text message via Telegram using basic HTML formatting. Supported tags: <b>, <i>, <u>, <s>, <tg-spoiler>, <code>, <pre>, <a href='...'>. Remember to escape <, >, &.",
@@ -168,12 +209,16 @@ TOOLS = {
     }
 }
 
+# The registry is immutable after import, so the tools/list result can
+# be built once instead of per request
+_TOOLS_LIST_RESULT = {"tools": [tool["schema"] for tool in TOOLS.values()]}
+
 
 # --- MCP Message Handlers ---
 async def handle_initialize(params: Dict[str, Any], session: SSESession) -> Dict[str, Any]:
     """Handle MCP initialize request"""
     session.initialized = True
-    logging.info(f"Session {session.session_id} initialized")
+    logging.info("Session %s initialized", session.session_id)
     
     return {
         "protocolVersion": "2024-11-05",
@@ -189,8 +234,7 @@ async def handle_initialize(params: Dict[str, Any], session: SSESession) -> Dict
 
 async def handle_tools_list(params: Dict[str, Any], session: SSESession) -> Dict[str, Any]:
     """Handle tools/list request"""
-    tools = [tool["schema"] for tool in TOOLS.values()]
-    return {"tools": tools}
+    return _TOOLS_LIST_RESULT
 
 
 async def handle_tools_call(params: Dict[str, Any], session: SSESession) -> Dict[str, Any]:
@@ -201,30 +245,39 @@ async def handle_tools_call(params: Dict[str, Any], session: SSESession) -> Dict
     if tool_name not in TOOLS:
         raise HTTPException(status_code=400, detail=f"Unknown tool: {tool_name}")
     
-    handler = TOOLS[tool_name]["handler"]
-    result = await handler(tool_params)
+    tool = TOOLS[tool_name]
+    params_model = tool.get("params_model")
+    if params_model is not None:
+        # Validate in pydantic-core before touching the Telegram client
+        try:
+            tool_params = params_model.model_validate(tool_params)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid parameters for {tool_name}: {e}")
+    result = await tool["handler"](tool_params)
     
     return {
         "content": [
             {
                 "type": "text",
-                "text": json.dumps(result, indent=2)
+                "text": orjson.dumps(result).decode()
             }
         ]
     }
 
 
 # --- MCP Request Router ---
+_METHOD_HANDLERS = {
+    "initialize": handle_initialize,
+    "tools/list": handle_tools_list,
+    "tools/call": handle_tools_call,
+}
+
+
 async def handle_mcp_request(request: JSONRPCRequest, session: SSESession) -> Optional[Dict[str, Any]]:
     """Route MCP requests to appropriate handlers"""
     try:
-        if request.method == "initialize":
-            result = await handle_initialize(request.params or {}, session)
-        elif request.method == "tools/list":
-            result = await handle_tools_list(request.params or {}, session)
-        elif request.method == "tools/call":
-            result = await handle_tools_call(request.params or {}, session)
-        else:
+        handler = _METHOD_HANDLERS.get(request.method)
+        if handler is None:
             return {
                 "jsonrpc": "2.0",
                 "id": request.id,
@@ -233,7 +286,8 @@ async def handle_mcp_request(request: JSONRPCRequest, session: SSESession) -> Op
                     "message": f"Method not found: {request.method}"
                 }
             }
-        
+        result = await handler(request.params or {}, session)
+
         return {
             "jsonrpc": "2.0",
             "id": request.id,
@@ -250,7 +304,7 @@ async def handle_mcp_request(request: JSONRPCRequest, session: SSESession) -> Op
             }
         }
     except Exception as e:
-        logging.error(f"Error handling MCP request {request.method}: {e}")
+        logging.error("Error handling MCP request %s: %s", request.method, e)
         return {
             "jsonrpc": "2.0",
             "id": request.id,
@@ -270,14 +324,23 @@ async def lifespan(app: FastAPI):
     if not await initialize_telegram():
         logging.error("Failed to initialize Telegram bot")
         sys.exit(1)
-    
-    logging.info(f"Server starting on {settings.host}:{settings.port}")
+
+    # Pre-warm the pooled connection so the first /message call pays
+    # steady-state latency instead of a fresh TLS handshake
+    try:
+        await telegram_bot.get_webhook_info()
+    except Exception as e:
+        logging.warning("Telegram connection pre-warm failed: %s", e)
+
+    logging.info("Server starting on %s:%s", settings.host, settings.port)
     yield
     
     # Shutdown
     logging.info("Shutting down...")
     for session in sessions.values():
         session.close()
+    if telegram_bot:
+        await telegram_bot.shutdown()
 
 
 # --- FastAPI App ---
@@ -287,129 +350,144 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORS is wildcard-open, so the headers are process constants; stamping
+# them per response avoids running a Python middleware hop on every
+# request and every SSE chunk
+_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "*",
+    "Access-Control-Allow-Headers": "*",
+}
+
+
+@app.options("/{path:path}")
+async def cors_preflight(path: str):
+    """Answer CORS preflight requests with the static wildcard headers"""
+    return Response(status_code=204, headers=_CORS_HEADERS)
 
 
 # --- SSE Event Stream ---
-async def sse_event_stream(session: SSESession, base_url: str):
+async def sse_event_stream(session: SSESession, request: Request, base_url: str):
     """Generate SSE events for a session"""
+    heartbeat_task = None
     try:
         # Send initial endpoint event
         message_endpoint = f"{base_url}/message?sessionId={session.session_id}"
-        yield f"event: endpoint\ndata: {message_endpoint}\n\n"
-        
-        # Start notification handler
-        async def handle_notifications():
+        yield f"event: endpoint\ndata: {message_endpoint}\n\n".encode()
+
+        # Keep-alives and disconnect polling live in a side task, so the
+        # main loop is a plain queue read with no per-iteration timer
+        async def heartbeat():
             while not session.closed:
-                try:
-                    notification = await asyncio.wait_for(
-                        session.notification_queue.get(), timeout=1.0
-                    )
-                    if hasattr(notification, 'model_dump_json'):
-                        event_data = notification.model_dump_json()
-                    else:
-                        event_data = json.dumps(notification)
-                    await session.send_event(f"event: message\ndata: {event_data}\n\n")
-                except asyncio.TimeoutError:
-                    continue
-                except Exception as e:
-                    logging.error(f"Error handling notification: {e}")
+                await asyncio.sleep(15.0)
+                if await request.is_disconnected():
+                    logging.info("SSE client disconnected: %s", session.session_id)
+                    session.close()
                     break
-        
-        # Start notification handler task
-        notification_task = asyncio.create_task(handle_notifications())
-        
-        # Main event loop
-        while not session.closed:
-            try:
-                # Wait for events with timeout for keep-alive
-                event = await asyncio.wait_for(session.event_queue.get(), timeout=15.0)
-                yield event
-            except asyncio.TimeoutError:
-                # Send keep-alive
-                yield ": keep-alive\n\n"
-            except Exception as e:
-                logging.error(f"Error in SSE stream: {e}")
+                await session.send_event(_KEEPALIVE)
+
+        heartbeat_task = asyncio.create_task(heartbeat())
+
+        # Main event loop; the queue read is bound to a local so each
+        # iteration skips the session/queue attribute lookups
+        queue_get = session.event_queue.get
+        while True:
+            event = await queue_get()
+            if event is _CLOSE_SENTINEL:
                 break
-        
-        # Clean up
-        notification_task.cancel()
-        try:
-            await notification_task
-        except asyncio.CancelledError:
-            pass
-        
+            yield event
+
     except Exception as e:
-        logging.error(f"SSE stream error: {e}")
+        logging.error("SSE stream error: %s", e)
     finally:
+        # Always runs, including on GeneratorExit when the client drops
+        # mid-stream, so sessions never outlive their connection
+        sessions.pop(session.session_id, None)
         session.close()
-        if session.session_id in sessions:
-            del sessions[session.session_id]
+        if heartbeat_task is not None:
+            heartbeat_task.cancel()
+        while not session.event_queue.empty():
+            session.event_queue.get_nowait()
 
 
 # --- Endpoints ---
 @app.get("/sse")
 async def sse_endpoint(request: Request):
     """SSE endpoint for MCP clients"""
-    session_id = str(uuid.uuid4())
+    session_id = _token_hex(16)
     session = SSESession(session_id)
+
+    # Bound the session table: evict least-recently-used sessions so a
+    # misbehaving client cannot grow memory without limit
+    while len(sessions) >= settings.max_sessions:
+        old_id, old_session = sessions.popitem(last=False)
+        old_session.close()
+        logging.warning("Session limit reached, evicted session %s", old_id)
+
     sessions[session_id] = session
     
     base_url = f"{request.url.scheme}://{request.url.netloc}"
     
-    logging.info(f"New SSE connection: {session_id}")
+    logging.info("New SSE connection: %s", session_id)
     
     return StreamingResponse(
-        sse_event_stream(session, base_url),
+        sse_event_stream(session, request, base_url),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "Access-Control-Allow-Origin": "*",
+            **_CORS_HEADERS,
         }
     )
 
 
-@app.post("/message")
-async def message_endpoint(
-    request: Request,
-    sessionId: str = Query(..., description="Session ID")
-):
-    """Message endpoint for MCP requests"""
+_ACCEPTED_RESPONSE = b'{"status":"accepted"}'
+
+
+async def message_endpoint(request: Request) -> Response:
+    """Message endpoint for MCP requests
+
+    Registered as a plain ASGI route (see add_route below) so the hottest
+    endpoint skips FastAPI's dependency-injection and validation wrappers.
+    """
+    sessionId = request.query_params.get("sessionId")
     if sessionId not in sessions:
         raise HTTPException(status_code=400, detail="Invalid session ID")
     
     session = sessions[sessionId]
     if session.closed:
         raise HTTPException(status_code=400, detail="Session closed")
+    # Active sessions move to the back so eviction hits idle ones first
+    sessions.move_to_end(sessionId)
     
     try:
-        # Parse JSON-RPC request
-        body = await request.json()
-        mcp_request = JSONRPCRequest(**body)
+        # Parse and validate straight from the body bytes in pydantic-core,
+        # skipping the intermediate dict a separate loads() would build
+        mcp_request = JSONRPCRequest.model_validate_json(await request.body())
         
         # Handle the request
         response = await handle_mcp_request(mcp_request, session)
         
         # Send response via SSE if it exists
         if response:
-            response_data = json.dumps(response)
-            event = f"event: message\ndata: {response_data}\n\n"
-            await session.send_event(event)
-        
-        return {"status": "accepted"}
-        
+            event = _MESSAGE_EVENT_PREFIX + orjson.dumps(response) + b"\n\n"
+            if not await session.send_event(event):
+                raise HTTPException(status_code=503, detail="Session not consuming events")
+
+        return Response(
+            _ACCEPTED_RESPONSE, media_type="application/json", headers=_CORS_HEADERS
+        )
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error processing message: {e}")
+        logging.error("Error processing message: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+app.router.add_route("/message", message_endpoint, methods=["POST"])
+
+
 @app.get("/")
 async def root():
     """Root endpoint with server info"""
@@ -437,6 +515,9 @@ if __name__ == "__main__":
         "main:app",
         host=settings.host,
         port=settings.port,
+        loop="uvloop",
+        http="httptools",
+        workers=settings.workers or os.cpu_count(),
         log_level="debug" if settings.debug else "info",
         reload=False
     )